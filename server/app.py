@@ -1,11 +1,17 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, make_response, send_from_directory, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
-from phase2_vertex import generate_vertex_overlay
-import os, json, re, html, base64, binascii
+import os, sys, re, html, binascii, hashlib, mimetypes
+import orjson
+import pybase64
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
 from uuid import uuid4
 from typing import Tuple
-from cerebras.cloud.sdk import Cerebras
+from blake3 import blake3
 
 # -------------------- SETUP --------------------
 load_dotenv()
@@ -13,11 +19,75 @@ app = Flask(__name__)
 CORS(app)
 
 UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads")
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs("outputs", exist_ok=True)
 API_PREFIX = "/api"
 
-client = Cerebras(api_key=os.getenv("CEREBRAS_API_KEY"))
+# Working directories are created on first use rather than at import, so
+# worker spawns / reloads that never take an upload skip the stat syscalls.
+_DIRS_READY = False
+
+
+def _bootstrap_dirs():
+    global _DIRS_READY
+    if _DIRS_READY:
+        return
+    for directory in (UPLOAD_FOLDER, "outputs"):
+        try:
+            os.mkdir(directory)
+        except FileExistsError:
+            pass
+    _DIRS_READY = True
+
+# When set (e.g. "/internal-uploads"), upload responses delegate the file body
+# to the fronting nginx via X-Accel-Redirect so the kernel's sendfile() moves
+# the bytes instead of the Python interpreter. Requires a matching internal
+# location block aliasing the uploads directory.
+UPLOADS_ACCEL_PREFIX = os.getenv("UPLOADS_ACCEL_PREFIX", "").rstrip("/")
+
+# The Cerebras SDK (and phase2_vertex with its google-genai/rembg stack) are
+# imported lazily so worker cold start doesn't pay for them before the first
+# request that actually needs them.
+_cerebras_client = None
+_cerebras_client_lock = threading.Lock()
+
+
+def _get_client():
+    global _cerebras_client
+    # Double-checked init: concurrent first requests must not each build
+    # their own connection pool and leak all but the last one.
+    if _cerebras_client is None:
+        with _cerebras_client_lock:
+            if _cerebras_client is None:
+                import httpx
+                from cerebras.cloud.sdk import Cerebras
+
+                # Long-lived pooled connections: steady-state Phase-1 calls
+                # reuse a warm TCP+TLS session instead of paying a fresh
+                # handshake each time, and the generous timeout covers slow
+                # generations.
+                http_client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_keepalive_connections=32,
+                        max_connections=64,
+                        keepalive_expiry=300.0,
+                    ),
+                    timeout=httpx.Timeout(120.0, connect=5.0),
+                )
+                _cerebras_client = Cerebras(
+                    api_key=os.getenv("CEREBRAS_API_KEY"), http_client=http_client
+                )
+    return _cerebras_client
+
+
+def ojson(obj, status: int = 200) -> Response:
+    """jsonify replacement backed by orjson's C serializer."""
+    return Response(orjson.dumps(obj), status=status, mimetype="application/json")
+
+# Patterns used on every request, compiled once; re.ASCII keeps the engine on
+# its byte-class fast path for the plain inputs these see.
+_WS_RE = re.compile(r"\s+")
+_SLUG_RE = re.compile(r"[^a-zA-Z0-9_-]+", re.ASCII)
+_JSON_BLOCK_RE = re.compile(r"\{.*\}", re.DOTALL)
+_NON_ASCII_RE = re.compile(r"[^\x00-\x7f]+")
 
 # -------------------- LENS PROMPTS --------------------
 MATHEMATICIAN_PROMPT = (
@@ -58,35 +128,34 @@ LENS_PROMPTS = {
     "artist": ARTIST_PROMPT,
     "eco": ECO_PROMPT,
     "cultural": CULTURAL_PROMPT,
-    "math": MATHEMATICIAN_PROMPT,
-    "physics": PHYSICIST_PROMPT,
 }
 
 DEFAULT_LENS = "mathematician"
 LENS_ALIASES = {
     "math": "mathematician",
-    "mathematician": "mathematician",
     "physics": "physicist",
-    "physicist": "physicist",
     "bio": "biologist",
-    "biologist": "biologist",
-    "artist": "artist",
-    "eco": "eco",
     "sustainability": "eco",
     "environmental": "eco",
-    "cultural": "cultural",
     "culture": "cultural",
 }
 
+# Every accepted spelling maps straight to its canonical lens in one dict, so
+# resolution is a single lookup; keys are interned so the per-request hash hits
+# precomputed string hashes.
+LENS_RESOLVE = {
+    sys.intern(alias): canonical
+    for alias, canonical in {**{name: name for name in LENS_PROMPTS}, **LENS_ALIASES}.items()
+}
+
 # -------------------- PHASE 1 PROMPT TEMPLATE --------------------
+# Templates keep every static instruction (role, schema, bullet specs, examples)
+# in a fixed prefix and append the per-request Object/Image lines last, so
+# provider-side prefix caching keys stay identical across requests sharing a lens.
 PHASE1_PROMPT = """
 You are generating structured data for a mathematical lens AI that will create holographic,
 blueprint-style skeleton diagrams of real-world objects.
 
-Given the following information:
-Object: {object}
-Image (optional): {image_url}
-
 Return a JSON object with exactly four keys:
 1. "object" – the object’s name.
 2. "equation" – the most relevant mathematical formula describing its measurable property
@@ -112,11 +181,6 @@ Example output:
 
 
 PHASE1_PROMPT_PHYSICS = """
-Given the following information:
-
-Object: {object}
-Image (optional): {image_url}
-
 Return a JSON output with exactly four keys:
 1. "object" — repeat the object's name.
 2. "equation" — the most relevant PHYSICS equation describing how the object behaves or interacts
@@ -143,10 +207,6 @@ Example output:
 PHASE1_PROMPT_BIOLOGY = """
 You are generating structured data for a biology lens AI that overlays educational facts on real imagery.
 
-Given the following information:
-Object: {object}
-Image (optional): {image_url}
-
 Return a JSON object with exactly three keys:
 1. "object" – the object's name.
 2. "equation" – the core biological relationship, proportionality, or rate to highlight.
@@ -162,10 +222,6 @@ Example output:
 PHASE1_PROMPT_ART = """
 You are generating structured data for an artist lens AI that overlays creative commentary on a live camera feed.
 
-Given the following information:
-Object: {object}
-Image (optional): {image_url}
-
 Return a JSON object with exactly three keys:
 1. "object" – the object's name.
 2. "equation" – describe the aesthetic recipe, palette shorthand, rhythm, or lighting ratio in a compact formula-like
@@ -182,10 +238,6 @@ Example output:
 PHASE1_PROMPT_ECO = """
 You are generating structured data for an eco lens AI that overlays sustainability facts on top of real imagery.
 
-Given the following information:
-Object: {object}
-Image (optional): {image_url}
-
 Return a JSON object with exactly three keys:
 1. "object" – the object's name.
 2. "equation" – express a low-level sustainability relationship or carbon metric (e.g., "Annual CO₂ savings = baseline - efficient usage").
@@ -201,10 +253,6 @@ Example output:
 PHASE1_PROMPT_CULTURAL = """
 You are generating structured data for a cultural lens AI that reveals linguistic or historical origins of objects.
 
-Given the following information:
-Object: {object}
-Image (optional): {image_url}
-
 Return a JSON object with exactly three keys:
 1. "object" – the object's name.
 2. "equation" – summarize the cultural data as a compact expression (e.g., "Origin = Edo Japan · Meaning = 'writing brush'").
@@ -419,39 +467,118 @@ CULTURAL_EXAMPLE = """{
   "explanation": "Folding a thousand cranes (senbazuru) became a Japanese tradition for recovery and peace, especially after the story of Sadako Sasaki."
 }"""
 
+# The raw example blocks are concatenated JSON objects; parse them exactly once
+# at import so a malformed example fails at startup rather than mid-request, and
+# keep a minified rendering for the prompt slot to cut tokens on every call.
+_EXAMPLE_SPLIT = re.compile(r"\}\s*\n\s*\{")
+
+EXAMPLES_RAW = {
+    "mathematician": MATHEMATICIAN_EXAMPLE,
+    "physicist": PHYSICIST_EXAMPLE,
+    "biologist": BIOLOGIST_EXAMPLE,
+    "artist": ARTIST_EXAMPLE,
+    "eco": ECO_EXAMPLE,
+    "cultural": CULTURAL_EXAMPLE,
+}
+
+
+def _parse_examples(raw: str) -> list:
+    objects = []
+    for piece in _EXAMPLE_SPLIT.split(raw.strip()):
+        piece = piece.strip()
+        if not piece.startswith("{"):
+            piece = "{" + piece
+        if not piece.endswith("}"):
+            piece = piece + "}"
+        objects.append(orjson.loads(piece))
+    return objects
+
+
+EXAMPLES_PARSED = {lens: _parse_examples(raw) for lens, raw in EXAMPLES_RAW.items()}
+
+# Three examples carry the few-shot format just as well as six, and the ones
+# beyond that repeat the same Step 1..Step 5 phrasing. The subset is fixed
+# rather than sampled per request so the prompt prefix stays byte-identical
+# for provider-side prefix caching.
+_EXAMPLES_PER_PROMPT = 3
+
+EXAMPLES_MIN = {
+    lens: "\n\n".join(orjson.dumps(obj).decode() for obj in objects[:_EXAMPLES_PER_PROMPT])
+    for lens, objects in EXAMPLES_PARSED.items()
+}
+
 PHASE1_CONFIG = {
-    "mathematician": {"template": PHASE1_PROMPT, "example": MATHEMATICIAN_EXAMPLE},
-    "physicist": {"template": PHASE1_PROMPT_PHYSICS, "example": PHYSICIST_EXAMPLE},
-    "biologist": {"template": PHASE1_PROMPT_BIOLOGY, "example": BIOLOGIST_EXAMPLE},
-    "artist": {"template": PHASE1_PROMPT_ART, "example": ARTIST_EXAMPLE},
-    "eco": {"template": PHASE1_PROMPT_ECO, "example": ECO_EXAMPLE},
-    "cultural": {"template": PHASE1_PROMPT_CULTURAL, "example": CULTURAL_EXAMPLE},
+    "mathematician": {"template": PHASE1_PROMPT, "example": EXAMPLES_MIN["mathematician"]},
+    "physicist": {"template": PHASE1_PROMPT_PHYSICS, "example": EXAMPLES_MIN["physicist"]},
+    "biologist": {"template": PHASE1_PROMPT_BIOLOGY, "example": EXAMPLES_MIN["biologist"]},
+    "artist": {"template": PHASE1_PROMPT_ART, "example": EXAMPLES_MIN["artist"]},
+    "eco": {"template": PHASE1_PROMPT_ECO, "example": EXAMPLES_MIN["eco"]},
+    "cultural": {"template": PHASE1_PROMPT_CULTURAL, "example": EXAMPLES_MIN["cultural"]},
+}
+
+# Static prefixes (template + example) built once at import; per-request work
+# is a single concat of the dynamic suffix.
+PHASE1_PREFIXES = {
+    lens: config["template"].format(example=config["example"])
+    for lens, config in PHASE1_CONFIG.items()
 }
 
+VALID_LENSES = frozenset(LENS_RESOLVE)
+
 
+@lru_cache(maxsize=32)
 def resolve_lens_mode(raw_mode: str | None) -> str:
     if raw_mode:
-        normalized = raw_mode.strip().lower()
-        candidate = LENS_ALIASES.get(normalized, normalized)
-        if candidate in PHASE1_CONFIG:
-            return candidate
+        name = raw_mode.strip().casefold()
+        if name in VALID_LENSES:
+            return LENS_RESOLVE[name]
     return DEFAULT_LENS
 
 
+@lru_cache(maxsize=512)
 def build_phase1_prompt(lens_mode: str, object_name: str, image_url: str | None) -> str:
-    config = PHASE1_CONFIG.get(lens_mode, PHASE1_CONFIG[DEFAULT_LENS])
-    safe_image = image_url or "none"
-    return config["template"].format(object=object_name, image_url=safe_image, example=config["example"])
+    prefix = PHASE1_PREFIXES.get(lens_mode, PHASE1_PREFIXES[DEFAULT_LENS])
+    return f"{prefix}\n\nObject: {object_name}\nImage (optional): {image_url or 'none'}\n"
+
+# Replacement tables and patterns for the cleaners, built once: translate()
+# applies the whole character map in a single C pass per string.
+# The multiplication marks used to map to a non-ASCII sign that the byte
+# strip deleted one step later, so they map straight to None now.
+_PROMPT_TRANS = str.maketrans({
+    "\u00b7": None,
+    "x": None,
+    "X": None,
+    "\u2013": "-", "\u2014": "-", "\u201c": '"', "\u201d": '"', "\u2018": "'", "\u2019": "'", "\u2022": "-",
+})
+_EXPLANATION_TRANS = str.maketrans({
+    "\u00b2": "^2",
+    "\u00b3": "^3",
+    "\u00b7": "*",
+    "\u00d7": "*",
+    "\u00f7": "/",
+    "\u2013": "-",
+    "\u2014": "-",
+    "\u221a": "sqrt",
+    "\u03b8": "theta",
+    "\u00b0": " degrees",
+    "\u00b1": "+/-",
+    "\u2248": "~",
+})
+_EXPLANATION_BAD_RE = re.compile(r"[^a-zA-Z0-9.,:;!?()'\"*/^~+= _-]+")
 
 # -------------------- CLEANER --------------------
 def _ensure_text(value) -> str:
+    # Exact-type check first: model output is overwhelmingly plain str, and
+    # `type(...) is str` skips the mro walk isinstance does.
+    if type(value) is str:
+        return value
     if isinstance(value, str):
         return value
     if isinstance(value, list):
         return " ".join(_ensure_text(item) for item in value)
     if isinstance(value, dict):
         try:
-            return json.dumps(value, ensure_ascii=False)
+            return orjson.dumps(value).decode()
         except Exception:
             return str(value)
     return "" if value is None else str(value)
@@ -463,57 +590,24 @@ def clean_text_for_prompt(text) -> str:
     if not text:
         return ""
 
-    replacements = {
-        "·": "×",  
-        "x": "×",  
-        "X": "×",
-        "÷": "÷",
-        "^": "^",
-        "√": "√",
-        "–": "-", "—": "-", "“": '"', "”": '"', "‘": "'", "’": "'", "•": "-"
-    }
-
-
-    for bad, good in replacements.items():
-        text = text.replace(bad, good)
-
-    text = re.sub(r"\s+", " ", text).strip()
-    text = text.encode("ascii", "ignore").decode("ascii")
+    text = text.translate(_PROMPT_TRANS)
+    text = _NON_ASCII_RE.sub("", text)
+    text = _WS_RE.sub(" ", text).strip()
     return text
 
+
 def clean_explanation(text) -> str:
     """Cleans and normalizes physics explanations for visual rendering."""
     text = _ensure_text(text)
     if not text:
         return ""
 
-    import html, re
-
-    # Decode HTML entities
+    # Decode HTML entities, map problematic physics/math symbols, then drop
+    # residual formatting characters and collapse whitespace
     text = html.unescape(text)
-
-    # Replace problematic physics/math symbols
-    replacements = {
-        "²": "^2",
-        "³": "^3",
-        "·": "*",
-        "×": "*",
-        "÷": "/",
-        "–": "-",
-        "—": "-",
-        "√": "sqrt",
-        "θ": "theta",
-        "°": " degrees",
-        "±": "+/-",
-        "≈": "~",
-    }
-
-    for k, v in replacements.items():
-        text = text.replace(k, v)
-
-    # Clean residual formatting characters and collapse whitespace
-    text = re.sub(r"[^a-zA-Z0-9.,:;!?()'\"*/^~+= _-]+", " ", text)
-    text = re.sub(r"\s+", " ", text).strip()
+    text = text.translate(_EXPLANATION_TRANS)
+    text = _EXPLANATION_BAD_RE.sub(" ", text)
+    text = _WS_RE.sub(" ", text).strip()
 
     # Truncate to avoid overflow
     if len(text) > 250:
@@ -523,46 +617,134 @@ def clean_explanation(text) -> str:
 
 
 def sanitize_slug(value: str, fallback: str = "object") -> str:
-    sanitized = re.sub(r"[^a-zA-Z0-9_-]+", "-", value or fallback).strip("-")
+    sanitized = _SLUG_RE.sub("-", value or fallback).strip("-")
     return sanitized or fallback
 
 
+# Repeat uploads are common (retries, re-detections of the same crop), so a
+# cheap digest of the still-encoded payload short-circuits the whole
+# decode-hash-write path; the write itself runs on a small executor to keep
+# the request thread free.
+# File extensions the upload path will embed in a filename; everything else
+# degrades to png.
+_ALLOWED_IMAGE_EXTS = frozenset({"png", "jpg", "gif", "webp", "heic", "heif", "bmp", "tiff"})
+
+_UPLOAD_MEMO: OrderedDict = OrderedDict()
+_UPLOAD_MEMO_MAX = 256
+# Same LRU discipline as the Phase-1 cache — and here eviction can also run
+# on the upload executor's callback thread, so the lock is not optional.
+_UPLOAD_MEMO_LOCK = threading.Lock()
+_UPLOAD_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="upload-write")
+
+# Background writes in flight, keyed by destination path. Anything that
+# reads the file back (phase2) must call _await_upload_write first; the
+# memo above is only populated once a write has actually landed.
+_PENDING_WRITES: dict = {}
+
+
+def _memoize_upload(payload_key: str, entry: Tuple[str, str]) -> None:
+    with _UPLOAD_MEMO_LOCK:
+        _UPLOAD_MEMO[payload_key] = entry
+        if len(_UPLOAD_MEMO) > _UPLOAD_MEMO_MAX:
+            _UPLOAD_MEMO.popitem(last=False)
+
+
+def _upload_write_done(future, payload_key: str, entry: Tuple[str, str]) -> None:
+    _PENDING_WRITES.pop(entry[0], None)
+    if future.exception() is None:
+        _memoize_upload(payload_key, entry)
+    else:
+        app.logger.error("Upload write failed for %s", entry[0], exc_info=future.exception())
+
+
+def _await_upload_write(path: str) -> None:
+    """Block until any pending background write for *path* has landed."""
+    future = _PENDING_WRITES.get(path)
+    if future is not None:
+        future.result()
+
+
 def persist_uploaded_image(image_base64: str, client_object_id: str, label: str) -> Tuple[str, str]:
     """Decode base64 image bytes, save to uploads/, and return (path, public_url)."""
     if not image_base64:
         raise ValueError("Missing imageBase64 payload.")
 
+    _bootstrap_dirs()
+
+    host_url = request.host_url.rstrip("/")
+    payload_key = hashlib.blake2b(image_base64.encode("ascii", "ignore"), digest_size=12).hexdigest()
+    with _UPLOAD_MEMO_LOCK:
+        memo = _UPLOAD_MEMO.get(payload_key)
+        if memo is not None:
+            _UPLOAD_MEMO.move_to_end(payload_key)
+    if memo is not None:
+        path, filename = memo
+        return path, f"{host_url}/uploads/{filename}"
+
     header, encoded = (image_base64.split(",", 1) + [""])[:2] if "," in image_base64 else ("", image_base64)
     try:
-        binary = base64.b64decode(encoded, validate=True)
+        binary = pybase64.b64decode(encoded, validate=True)
     except binascii.Error as exc:
         raise ValueError("Invalid base64 image data.") from exc
 
+    # Header format is fixed ("data:image/<ext>;base64"), so plain find/slice
+    # beats spinning up the regex engine per upload. The header is client
+    # controlled though, so anything outside the known formats — including
+    # path metacharacters a crafted header could smuggle in — falls back to
+    # png rather than reaching the filename.
     extension = "png"
-    if "image/" in header:
-        match = re.search(r"image/([a-zA-Z0-9.+-]+)", header)
-        if match:
-            extension = match.group(1)
+    i = header.find("image/")
+    if i != -1:
+        j = header.find(";", i)
+        extension = header[i + 6:j] if j != -1 else header[i + 6:]
     extension = extension.replace("jpeg", "jpg")
+    if extension not in _ALLOWED_IMAGE_EXTS:
+        extension = "png"
 
+    # Content-addressed naming: identical uploads (retries, re-detections of
+    # the same crop) map to one file, so duplicates skip the disk write and
+    # downstream caches can key on the digest embedded in the URL.
     safe_label = sanitize_slug(label)
-    filename = f"{sanitize_slug(client_object_id)[:20]}_{safe_label}.{extension}"
-    path = os.path.join(UPLOAD_FOLDER, filename)
-    with open(path, "wb") as output:
-        output.write(binary)
+    digest = blake3(binary).hexdigest()[:32]
+    filename = f"{safe_label}_{digest}.{extension}"
+    path = Path(UPLOAD_FOLDER) / filename
+    entry = (str(path), filename)
+    if path.exists():
+        _memoize_upload(payload_key, entry)
+    elif str(path) not in _PENDING_WRITES:
+        # The write overlaps the Phase-1 call that usually follows, but it is
+        # tracked: phase2 awaits it before reading the file back, and the
+        # memo only records the payload once the write has succeeded.
+        future = _UPLOAD_EXECUTOR.submit(path.write_bytes, binary)
+        _PENDING_WRITES[str(path)] = future
+        future.add_done_callback(
+            lambda f, k=payload_key, e=entry: _upload_write_done(f, k, e)
+        )
+
+    return str(path), f"{host_url}/uploads/{filename}"
 
-    host_url = request.host_url.rstrip("/")
-    return path, f"{host_url}/uploads/{filename}"
 
+# -------------------- PHASE 1 FUNCTION --------------------
+# Cerebras calls are billed multi-second round-trips, and the same
+# (lens, object) pair repeats constantly as the camera re-detects objects.
+# Cache responses on a normalized key so repeats become dict lookups.
+_PHASE1_CACHE: OrderedDict = OrderedDict()
+_PHASE1_CACHE_MAX = 512
+# Guards the get/move_to_end/evict triplet: under threaded serving another
+# thread's store can evict a key between an unlocked get and its LRU touch.
+_PHASE1_CACHE_LOCK = threading.Lock()
 
-def encode_file_to_base64(image_path: str) -> str:
-    if not image_path or not os.path.exists(image_path):
-        raise FileNotFoundError("Generated overlay image missing.")
-    with open(image_path, "rb") as handle:
-        return base64.b64encode(handle.read()).decode("utf-8")
+# In-flight coalescing: when several threads miss the cache on the same key at
+# once (a burst of detections of the same object), only the first issues the
+# Cerebras call; the rest block on its Future and share the result.
+_PHASE1_INFLIGHT: dict = {}
+_PHASE1_INFLIGHT_LOCK = threading.Lock()
+
+
+def _phase1_cache_key(lens_mode: str, object_name: str) -> Tuple[str, str]:
+    return lens_mode, _WS_RE.sub(" ", object_name).lower()
 
 
-# -------------------- PHASE 1 FUNCTION --------------------
 def generate_equation_facts(obj):
     object_name = (obj.get("object") or "").strip()
     if not object_name:
@@ -571,10 +753,40 @@ def generate_equation_facts(obj):
     lens_mode = resolve_lens_mode(obj.get("lens_mode"))
     image_url = obj.get("image_url") or ""
 
+    cache_key = _phase1_cache_key(lens_mode, object_name)
+    with _PHASE1_CACHE_LOCK:
+        cached = _PHASE1_CACHE.get(cache_key)
+        if cached is not None:
+            _PHASE1_CACHE.move_to_end(cache_key)
+            return dict(cached)
+
+    with _PHASE1_INFLIGHT_LOCK:
+        flight = _PHASE1_INFLIGHT.get(cache_key)
+        leader = flight is None
+        if leader:
+            flight = Future()
+            _PHASE1_INFLIGHT[cache_key] = flight
+
+    if not leader:
+        return dict(flight.result())
+
+    try:
+        parsed = _generate_equation_facts_uncached(lens_mode, object_name, image_url, cache_key)
+        flight.set_result(parsed)
+        return parsed
+    except BaseException as exc:
+        flight.set_exception(exc)
+        raise
+    finally:
+        with _PHASE1_INFLIGHT_LOCK:
+            _PHASE1_INFLIGHT.pop(cache_key, None)
+
+
+def _generate_equation_facts_uncached(lens_mode, object_name, image_url, cache_key):
     system_prompt = LENS_PROMPTS.get(lens_mode, LENS_PROMPTS[DEFAULT_LENS])
     prompt = build_phase1_prompt(lens_mode, object_name, image_url)
 
-    response = client.chat.completions.create(
+    response = _get_client().chat.completions.create(
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": prompt}
@@ -586,17 +798,66 @@ def generate_equation_facts(obj):
     )
 
     text = response.choices[0].message.content.strip()
-    match = re.search(r"\{.*\}", text, re.DOTALL)
+    match = _JSON_BLOCK_RE.search(text)
     if not match:
         raise ValueError("Model did not return valid JSON.")
 
-    return json.loads(match.group(0))
+    parsed = orjson.loads(match.group(0))
+
+    _phase1_cache_store(cache_key, parsed)
+    return parsed
+
+
+def _phase1_cache_store(cache_key, parsed) -> None:
+    with _PHASE1_CACHE_LOCK:
+        _PHASE1_CACHE[cache_key] = dict(parsed)
+        if len(_PHASE1_CACHE) > _PHASE1_CACHE_MAX:
+            _PHASE1_CACHE.popitem(last=False)
+
+
+def stream_equation_facts(obj):
+    """Yield Phase-1 completion text as it decodes instead of awaiting the full reply."""
+    object_name = (obj.get("object") or "").strip()
+    if not object_name:
+        raise ValueError("Object name is required for lens generation.")
+
+    lens_mode = resolve_lens_mode(obj.get("lens_mode"))
+    image_url = obj.get("image_url") or ""
+
+    system_prompt = LENS_PROMPTS.get(lens_mode, LENS_PROMPTS[DEFAULT_LENS])
+    prompt = build_phase1_prompt(lens_mode, object_name, image_url)
+
+    response = _get_client().chat.completions.create(
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ],
+        model="gpt-oss-120b",
+        stream=True,
+        max_completion_tokens=1024,
+        temperature=0.2
+    )
+
+    collected = []
+    for chunk in response:
+        delta = chunk.choices[0].delta.content
+        if delta:
+            collected.append(delta)
+            yield delta
+
+    # Warm the response cache so follow-up non-streaming requests hit it.
+    match = _JSON_BLOCK_RE.search("".join(collected))
+    if match:
+        try:
+            _phase1_cache_store(_phase1_cache_key(lens_mode, object_name), orjson.loads(match.group(0)))
+        except ValueError:
+            pass
 
 
 # -------------------- API ROUTES --------------------
 @app.route(f"{API_PREFIX}/health", methods=["GET"])
 def health():
-    return jsonify({"status": "ok"})
+    return ojson({"status": "ok"})
 
 
 @app.route(f"{API_PREFIX}/facts", methods=["POST"])
@@ -608,12 +869,12 @@ def process_object_facts():
     image_base64 = payload.get("imageBase64")
 
     if not image_base64:
-        return jsonify({"error": "imageBase64 is required."}), 400
+        return ojson({"error": "imageBase64 is required."}, 400)
 
     try:
         image_path, image_url = persist_uploaded_image(image_base64, client_object_id, label)
     except ValueError as exc:
-        return jsonify({"error": str(exc)}), 400
+        return ojson({"error": str(exc)}, 400)
 
     try:
         phase1 = generate_equation_facts({
@@ -626,7 +887,7 @@ def process_object_facts():
             phase1["equation"] = clean_text_for_prompt(phase1["equation"])
         explanation = clean_explanation(phase1.get("explanation", ""))
 
-        return jsonify({
+        return ojson({
             "clientObjectId": client_object_id,
             "lensMode": lens_mode,
             "label": label,
@@ -635,10 +896,49 @@ def process_object_facts():
             "imageUrl": image_url
         })
     except ValueError as exc:
-        return jsonify({"error": str(exc)}), 400
+        return ojson({"error": str(exc)}, 400)
     except Exception as exc:
-        print(f"❌ Facts generation error: {exc}")
-        return jsonify({"error": "Failed to generate facts.", "details": str(exc)}), 500
+        app.logger.exception("Facts generation error")
+        return ojson({"error": "Failed to generate facts.", "details": str(exc)}, 500)
+
+
+@app.route(f"{API_PREFIX}/facts/stream", methods=["POST"])
+def stream_object_facts():
+    """Server-Sent Events variant of /facts: tokens flush as the model decodes,
+    so clients can render the first keys at first-token time instead of waiting
+    for the full generation."""
+    payload = request.get_json(silent=True) or {}
+    client_object_id = payload.get("clientObjectId") or str(uuid4())
+    lens_mode = resolve_lens_mode(payload.get("lensMode"))
+    label = (payload.get("label") or payload.get("object") or "").strip() or "object"
+    image_base64 = payload.get("imageBase64")
+
+    if not image_base64:
+        return ojson({"error": "imageBase64 is required."}, 400)
+
+    try:
+        image_path, image_url = persist_uploaded_image(image_base64, client_object_id, label)
+    except ValueError as exc:
+        return ojson({"error": str(exc)}, 400)
+
+    def events():
+        try:
+            for delta in stream_equation_facts({
+                "object": label,
+                "image_url": image_url,
+                "lens_mode": lens_mode
+            }):
+                yield f"data: {orjson.dumps(delta).decode()}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        except Exception:
+            app.logger.exception("Facts streaming error")
+            yield 'event: error\ndata: {"error": "Failed to stream facts."}\n\n'
+
+    response = Response(stream_with_context(events()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # Keep nginx from buffering the stream back into one big flush.
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
 
 
 @app.route(f"{API_PREFIX}/objects", methods=["POST"])
@@ -650,12 +950,12 @@ def process_object_detection():
     image_base64 = payload.get("imageBase64")
 
     if not image_base64:
-        return jsonify({"error": "imageBase64 is required."}), 400
+        return ojson({"error": "imageBase64 is required."}, 400)
 
     try:
         image_path, image_url = persist_uploaded_image(image_base64, client_object_id, label)
     except ValueError as exc:
-        return jsonify({"error": str(exc)}), 400
+        return ojson({"error": str(exc)}, 400)
 
     try:
         phase1 = generate_equation_facts({
@@ -671,7 +971,14 @@ def process_object_detection():
         explanation = clean_explanation(phase1.get("explanation", ""))
         guide = phase1.get("guide", "Create a neon diagram of the object.")
 
-        overlay_path = generate_vertex_overlay(
+        from phase2_vertex import generate_vertex_overlay
+
+        # A Phase-1 cache hit can land here milliseconds after the upload was
+        # queued; make sure the reference image is on disk before phase2
+        # opens it.
+        _await_upload_write(image_path)
+
+        overlay_png = generate_vertex_overlay(
             guide,
             label,
             image_path,
@@ -679,12 +986,12 @@ def process_object_detection():
             explanation=explanation
         )
 
-        if not overlay_path:
+        if not overlay_png:
             raise RuntimeError("Vertex overlay generation returned no image.")
 
-        annotated_b64 = encode_file_to_base64(overlay_path)
+        annotated_b64 = pybase64.b64encode_as_string(overlay_png)
 
-        return jsonify({
+        return ojson({
             "clientObjectId": client_object_id,
             "annotatedImageBase64": annotated_b64,
             "message": phase1.get("equation") or "Overlay generated.",
@@ -693,16 +1000,33 @@ def process_object_detection():
             "lensMode": lens_mode
         })
     except ValueError as exc:
-        return jsonify({"error": str(exc)}), 400
+        return ojson({"error": str(exc)}, 400)
     except Exception as exc:
-        print(f"❌ Object processing error: {exc}")
-        return jsonify({"error": "Failed to process object.", "details": str(exc)}), 500
+        app.logger.exception("Object processing error")
+        return ojson({"error": "Failed to process object.", "details": str(exc)}, 500)
 
 
 # -------------------- STATIC ROUTE --------------------
 @app.route("/uploads/<path:filename>")
 def serve_uploaded_file(filename):
-    return send_from_directory(UPLOAD_FOLDER, filename)
+    # The path converter lets ".." segments through (percent-encoded forms are
+    # unquoted before routing), and the accel header below bypasses
+    # send_from_directory's safe join entirely. Nothing this server generates
+    # contains a separator, so reject anything that does.
+    if "/" in filename or "\\" in filename or ".." in filename:
+        return ojson({"error": "Not found."}, 404)
+    if UPLOADS_ACCEL_PREFIX and not app.debug:
+        response = make_response("")
+        response.headers["X-Accel-Redirect"] = f"{UPLOADS_ACCEL_PREFIX}/{filename}"
+        response.headers["Content-Type"] = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        response.headers["Cache-Control"] = "public, max-age=31536000"
+        return response
+
+    # Dev fallback: upload filenames are content-addressed — {label}_{digest}.{ext}
+    # with a digest of the payload — so a URL can never point at changed bytes:
+    # let browsers cache for a year and answer revalidations with a 304 instead
+    # of re-reading the file.
+    return send_from_directory(UPLOAD_FOLDER, filename, max_age=31536000, conditional=True)
 
 
 # -------------------- ENTRY --------------------
@@ -710,4 +1034,14 @@ if __name__ == "__main__":
     port = int(os.getenv("PORT", "5050"))
     print(f"Uploads folder: {UPLOAD_FOLDER}")
     print(f"Starting server on port {port}")
-    app.run(host="0.0.0.0", port=port, debug=True)
+    if os.getenv("FLASK_DEBUG"):
+        # Reloader + debugger for local hacking only: the dev server
+        # serializes requests, so a single slow Gemini call blocks everyone.
+        app.run(host="0.0.0.0", port=port, debug=True)
+    else:
+        # Threaded WSGI server so requests overlap their provider waits.
+        # Full deployments use gunicorn (see gunicorn.conf.py); this keeps
+        # the plain `python app.py` path production-safe too.
+        from waitress import serve
+
+        serve(app, host="0.0.0.0", port=port, threads=8)
@@ -0,0 +1,20 @@
+"""Gunicorn config for the Percepta backend.
+
+Run with:  gunicorn -c gunicorn.conf.py app:app
+
+The hot path blocks on multi-second Cerebras/Gemini calls, so threads
+per worker matter far more than CPU count: gthread workers let dozens of
+requests overlap their network waits instead of serializing behind the
+single-threaded dev server.
+"""
+
+import multiprocessing
+
+bind = "0.0.0.0:5050"
+worker_class = "gthread"
+workers = 2 * multiprocessing.cpu_count() + 1
+threads = 32
+# LLM + image-generation round-trips routinely take tens of seconds.
+timeout = 120
+keepalive = 75
+accesslog = "-"
@@ -1,8 +1,10 @@
 from google import genai
 from google.genai import types
-from rembg import remove
+from rembg import new_session, remove
 from PIL import Image
+import io
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 # -------------------- SETUP --------------------
@@ -10,6 +12,21 @@ load_dotenv()
 api_key = os.environ.get("GOOGLE_GENAI_API_KEY")
 client = genai.Client(api_key=api_key)
 
+# One ONNX session for all requests — building it per call reloads the model
+# weights every time. u2netp is ~4x smaller than the default u2net and holds
+# up fine for overlay cutouts.
+_BG_SESSION = new_session("u2netp")
+
+# Debug overlay copies write off the request thread; the response never
+# waits on the filesystem.
+_DEBUG_WRITER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="overlay-debug")
+
+
+def _write_debug_overlay(object_name, lens_mode, png_bytes):
+    os.makedirs("outputs", exist_ok=True)
+    with open(f"outputs/{object_name}_{lens_mode}.png", "wb") as handle:
+        handle.write(png_bytes)
+
 # -------------------- GENERATION --------------------
 def generate_vertex_overlay(prompt_text, object_name, image_path=None, lens_mode="math", explanation=None):
     # === MATH PROMPT ===
@@ -41,8 +58,14 @@ def generate_vertex_overlay(prompt_text, object_name, image_path=None, lens_mode
 
     if image_path and os.path.exists(image_path):
         try:
-            image = Image.open(image_path)
-            contents.append(image)
+            # Decode eagerly and close the file — a lazy Image handed to the
+            # SDK keeps the descriptor open until serialization, which leaks
+            # under concurrency. Gemini doesn't need a megapixel reference
+            # either, so cap the upload at 1024px per side.
+            with Image.open(image_path) as im:
+                im.load()
+                im.thumbnail((1024, 1024))
+                contents.append(im.copy())
         except Exception as e:
             print(f"⚠️ Could not open image: {e}")
 
@@ -51,15 +74,23 @@ def generate_vertex_overlay(prompt_text, object_name, image_path=None, lens_mode
         contents=contents,
     )
 
-    os.makedirs("outputs", exist_ok=True)
-    output_path = f"outputs/{object_name}_{lens_mode}.png"
-
     for part in response.parts:
         if getattr(part, "inline_data", None):
             image = part.as_image()
-            image.save(output_path)
-            final = Image.open(output_path).convert("RGBA")
-            final_no_bg = remove(final)
-            final_no_bg.save(output_path)
-            return output_path
+            # rembg copes with RGB(A) directly; only odd modes (P, L, CMYK)
+            # need the extra full-image conversion pass.
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA")
+            final_no_bg = remove(image, session=_BG_SESSION)
+            # Low compression on purpose: the caller base64-encodes these
+            # bytes right away, so heavy PNG compression is wasted CPU.
+            buffer = io.BytesIO()
+            final_no_bg.save(buffer, format="PNG", compress_level=1)
+            png_bytes = buffer.getvalue()
+
+            # Disk copies are debug-only now that the response is served
+            # straight from memory.
+            if os.getenv("SAVE_OVERLAYS"):
+                _DEBUG_WRITER.submit(_write_debug_overlay, object_name, lens_mode, png_bytes)
+            return png_bytes
     return None
\ No newline at end of file
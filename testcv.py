@@ -0,0 +1,476 @@
+import base64
+import os
+import queue
+import textwrap
+import threading
+from functools import lru_cache
+
+import cv2
+import numpy as np
+import torch
+from ultralytics import YOLO
+
+# Prefer a TensorRT engine when one has been exported next to the weights:
+#   yolo export model=yolov8n-seg.pt format=engine imgsz=416 half=True device=0
+# FP16 engines run 2-4x faster than the eager PyTorch path on tensor cores,
+# and the Results API downstream is identical either way.
+if os.path.exists("yolov8n-seg.engine"):
+    model = YOLO("yolov8n-seg.engine")
+else:
+    model = YOLO("yolov8n-seg.pt")
+
+# FP16 on CUDA doubles tensor throughput and halves activation bandwidth;
+# fall back to FP32 CPU where no GPU is around (dev laptops).
+DEVICE = 0 if torch.cuda.is_available() else "cpu"
+USE_HALF = DEVICE != "cpu"
+
+# Prefer OpenCV's CUDA filters when the build ships them (needs an
+# opencv-contrib build with CUDA); otherwise fall back to transparent
+# OpenCL offload, then plain CPU. The chain stays identical, only the
+# buffer type changes.
+USE_CUDA_CV = hasattr(cv2, "cuda") and cv2.cuda.getCudaEnabledDeviceCount() > 0
+USE_OPENCL = not USE_CUDA_CV and cv2.ocl.haveOpenCL()
+if USE_CUDA_CV:
+    _CANNY_GPU = cv2.cuda.createCannyEdgeDetector(80, 150)
+
+outline_mode = True
+
+object_info = {
+    "person": "Heat loss ~ surface area x dT. Limbs act as heat-exchange fins.",
+    "bottle": "V = pi r^2 h. Volume of a cylinder from radius and height.",
+    "cup": "C = 2 pi r. Rim circumference sweeps the radius full circle.",
+    "laptop": "d^2 = w^2 + h^2. Screen diagonal via the Pythagorean theorem.",
+    "chair": "Load per leg = W / 4 when the sitter's weight splits evenly.",
+    "book": "A = w x h. Cover area frames the rule-of-thirds test.",
+    "potted plant": "Soil volume = pi r^2 h for a cylindrical pot interior.",
+    "bicycle": "tau = r x F. Pedal torque equals crank radius times force.",
+}
+
+COLORS = [(255, 255, 0), (0, 255, 255), (255, 0, 255), (0, 255, 0)]
+EDGE_COLOR = (0, 255, 255)
+
+# Stamping the edge color is the one per-pixel loop left on the render
+# thread; Numba turns it into a parallel branch-per-pixel kernel with no
+# boolean-mask temporaries. The NumPy fallback keeps the script running
+# where numba isn't installed. cache=True amortizes the one-off compile
+# across runs.
+try:
+    from numba import njit, prange
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def apply_edges(out, edges, b, g, r):
+        for i in prange(edges.shape[0]):
+            for j in range(edges.shape[1]):
+                if edges[i, j]:
+                    out[i, j, 0] = b
+                    out[i, j, 1] = g
+                    out[i, j, 2] = r
+
+except ImportError:
+
+    def apply_edges(out, edges, b, g, r):
+        out[edges != 0] = (b, g, r)
+
+# 3x3 structuring element for the erosion-differenced mask outlines.
+_BOUNDARY_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+FONT_SCALE = 0.45
+LINE_HEIGHT = 18
+BOX_PADDING = 10
+
+# Wrapping and glyph measurement are identical for a given label, so they
+# run once per label instead of once per detection per frame.
+@lru_cache(maxsize=512)
+def info_layout(label):
+    info_text = object_info.get(label, "No fun fact for this one yet.")
+    wrapped = tuple(textwrap.wrap(info_text, width=28))
+    max_line_width = 0
+    for line in wrapped:
+        (line_w, _), _ = cv2.getTextSize(line, FONT, FONT_SCALE, 1)
+        max_line_width = max(max_line_width, line_w)
+    (title_w, _), _ = cv2.getTextSize(label.upper(), FONT, 0.55, 2)
+    max_line_width = max(max_line_width, title_w)
+    box_width = max_line_width + BOX_PADDING * 2
+    box_height = LINE_HEIGHT * (len(wrapped) + 1) + BOX_PADDING * 2
+    return wrapped, box_width, box_height
+
+
+# The info box is static per label, so the rectangle, border, title, and
+# wrapped text rasterize exactly once into a premultiplied sprite; the draw
+# loop collapses to one ROI blend per detection. Background pixels carry the
+# old 60% tint, drawn pixels land opaque.
+@lru_cache(maxsize=512)
+def label_sprite(label, color):
+    wrapped, box_width, box_height = info_layout(label)
+    sprite = np.full((box_height, box_width, 3), (20, 20, 20), np.uint8)
+    cv2.rectangle(sprite, (0, 0), (box_width - 1, box_height - 1), color, 1)
+    cv2.putText(
+        sprite,
+        label.upper(),
+        (BOX_PADDING, BOX_PADDING + 12),
+        FONT,
+        0.55,
+        color,
+        2,
+        cv2.LINE_AA,
+    )
+    for j, line in enumerate(wrapped):
+        cv2.putText(
+            sprite,
+            line,
+            (BOX_PADDING, BOX_PADDING + 12 + (j + 1) * LINE_HEIGHT),
+            FONT,
+            FONT_SCALE,
+            (255, 255, 255),
+            1,
+            cv2.LINE_AA,
+        )
+    drawn = (sprite != (20, 20, 20)).any(axis=2)
+    alpha = np.where(drawn[..., None], 1.0, 0.6).astype(np.float32)
+    # Premultiplied uint8 sprite plus a background mask: the blit needs
+    # only a masked AND and an addWeighted, with no float temporaries.
+    premult = (sprite * alpha).astype(np.uint8)
+    bg_mask = np.logical_not(drawn).astype(np.uint8) * 255
+    return premult, bg_mask, box_width, box_height
+
+
+# Quality 70 is plenty for a thumbnail crop and encodes in a fraction of
+# the default-95 time; the optimizer pass costs more CPU than it saves.
+ENC_PARAMS = [cv2.IMWRITE_JPEG_QUALITY, 70, cv2.IMWRITE_JPEG_OPTIMIZE, 0]
+
+
+def crop_and_encode(frame, box):
+    x1, y1, x2, y2 = map(int, box)
+    cropped = frame[max(0, y1):y2, max(0, x1):x2]
+    if cropped.size == 0:
+        return None
+    _, buf = cv2.imencode(".jpg", cropped, ENC_PARAMS)
+    return base64.b64encode(buf).decode("utf-8")
+
+
+# The crops aren't displayed — they feed the app's upload path — so the
+# JPEG + base64 work runs on a daemon thread. The renderer pays only a
+# non-blocking put and drops the crop when the encoder is behind; the
+# consumer reads the newest encoding per label from latest_crops.
+crop_q = queue.Queue(maxsize=8)
+latest_crops = {}
+
+
+def encode_crops():
+    while True:
+        label, crop_frame, box = crop_q.get()
+        latest_crops[label] = crop_and_encode(crop_frame, box)
+
+
+threading.Thread(target=encode_crops, daemon=True).start()
+
+
+# VIDEO_SRC may be a device index or a stream/file path; string sources go
+# through FFmpeg so the buffer-size hint below actually applies. Keeping the
+# driver buffer at one frame stops slow inference from being served stale
+# backlog.
+VIDEO_SRC = os.getenv("VIDEO_SRC", "0")
+if VIDEO_SRC.isdigit():
+    cap = cv2.VideoCapture(int(VIDEO_SRC))
+else:
+    cap = cv2.VideoCapture(VIDEO_SRC, cv2.CAP_FFMPEG)
+cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+if not cap.isOpened():
+    raise SystemExit("❌ Could not open camera")
+
+# Capture, inference, and rendering run as a three-stage pipeline so the GPU
+# never idles behind cap.read() or the overlay drawing. The queues are
+# bounded on purpose: when a stage falls behind, frames drop at the camera
+# instead of piling up as stale latency.
+stop_event = threading.Event()
+read_q = queue.Queue(maxsize=4)
+# Single-slot on purpose: the display only ever wants the newest frame, so
+# the inference stage drop-and-replaces rather than queueing stale ones.
+draw_q = queue.Queue(maxsize=1)
+
+# Inference dominates the frame budget, so only run the model every Kth frame
+# and reuse the last detections in between; the overlay still composites at
+# camera rate and objects barely move across 3 frames.
+DETECT_EVERY = 3
+
+# Inference cost scales ~quadratically with input side, so the model sees a
+# fixed small frame and the boxes are scaled back up for display. 416 is
+# ~2.4x fewer FLOPs than 640 and yolov8n still holds the handful of big
+# indoor classes this demo cares about.
+DET_W, DET_H = 416, 234
+
+
+def capture_frames():
+    while not stop_event.is_set():
+        ret, frame = cap.read()
+        if not ret:
+            stop_event.set()
+            break
+        # Latest-wins: when downstream is behind, evict the oldest queued
+        # frame rather than discarding the fresh one, so inference always
+        # has the most recent capture available (and batches stay warm).
+        while True:
+            try:
+                read_q.put_nowait(frame)
+                break
+            except queue.Full:
+                try:
+                    read_q.get_nowait()
+                except queue.Empty:
+                    pass
+
+
+def render_frames():
+    # Frame-sized scratch buffers allocate on the first frame and are
+    # reused; at camera rate, fresh copies of these every iteration churn
+    # tens of MB/s through the allocator for nothing. The camera resolution
+    # is fixed, so H and W are captured once with them instead of being
+    # re-read from frame.shape per detection.
+    edge_layer = None
+    outlined_frame = None
+    union = None
+    H = W = 0
+    while not stop_event.is_set():
+        try:
+            frame, (boxes, labels, masks, int_boxes) = draw_q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+
+        if outlined_frame is None:
+            outlined_frame = np.empty_like(frame)
+            edge_layer = np.zeros_like(frame)
+            H, W = frame.shape[:2]
+        np.copyto(outlined_frame, frame)
+
+        if outline_mode and len(masks):
+            # OR every mask into one union and run the expensive
+            # full-frame ops (cvtColor, Canny, glow, composite) exactly once
+            # per frame instead of once per detection.
+            # Masks arrive half-frame-sized and binarized from the
+            # inference stage, so this is pure uint8 ORing.
+            if union is None:
+                union = np.empty(masks[0].shape, np.uint8)
+            union[:] = 0
+            for mask_uint8 in masks:
+                cv2.bitwise_or(union, mask_uint8, dst=union)
+
+            # The edge/glow chain is memory-bound, so clamp it to the
+            # bounding box of everything detected rather than streaming
+            # the whole frame through five ops. Pad by the glow radius
+            # so the blur doesn't clip at the ROI border.
+            pad = 8
+            rx0 = max(int(int_boxes[:, 0].min()) - pad, 0)
+            ry0 = max(int(int_boxes[:, 1].min()) - pad, 0)
+            rx1 = min(int(int_boxes[:, 2].max()) + pad, W)
+            ry1 = min(int(int_boxes[:, 3].max()) + pad, H)
+            # Mask work happens at half resolution; h-prefixed bounds
+            # index the half-size buffers.
+            hx0, hy0 = rx0 // 2, ry0 // 2
+            hx1, hy1 = (rx1 + 1) // 2, (ry1 + 1) // 2
+            mroi = union[hy0:hy1, hx0:hx1]
+
+            small_roi = cv2.resize(
+                frame[ry0:ry1, rx0:rx1],
+                (mroi.shape[1], mroi.shape[0]),
+                interpolation=cv2.INTER_LINEAR,
+            )
+            if USE_CUDA_CV:
+                gpu_roi = cv2.cuda_GpuMat()
+                gpu_roi.upload(small_roi)
+                gray = cv2.cuda.cvtColor(gpu_roi, cv2.COLOR_BGR2GRAY)
+                # One download of the single-channel result; the mask
+                # AND is cheap on host.
+                edges = _CANNY_GPU.detect(gray).download()
+                edges = cv2.bitwise_and(edges, edges, mask=mroi)
+            elif USE_OPENCL:
+                uroi = cv2.UMat(small_roi)
+                gray = cv2.cvtColor(uroi, cv2.COLOR_BGR2GRAY)
+                edges = cv2.Canny(gray, 80, 150)
+                edges = cv2.bitwise_and(edges, edges, mask=cv2.UMat(mroi))
+                # Pull back once; the recolor below is NumPy fancy indexing.
+                edges = edges.get()
+            else:
+                gray = cv2.cvtColor(small_roi, cv2.COLOR_BGR2GRAY)
+                edges = cv2.Canny(gray, 80, 150)
+                edges = cv2.bitwise_and(edges, edges, mask=mroi)
+
+            # Upscale the single-channel edge map back to display size;
+            # the glow blur smears it anyway, so nearest is invisible.
+            edges = cv2.resize(edges, (rx1 - rx0, ry1 - ry0), interpolation=cv2.INTER_NEAREST)
+
+            # Recolor straight off the single-channel edge map — no
+            # GRAY2BGR blow-up, no 3-channel != [0,0,0] scan per pixel.
+            edge_roi = edge_layer[ry0:ry1, rx0:rx1]
+            edge_roi[:] = 0
+            apply_edges(edge_roi, edges, *EDGE_COLOR)
+
+            glow = cv2.GaussianBlur(edge_roi, (9, 9), 0)
+            blended = cv2.addWeighted(outlined_frame[ry0:ry1, rx0:rx1], 1.0, glow, 0.8, 0)
+            apply_edges(blended, edges, *EDGE_COLOR)
+            outlined_frame[ry0:ry1, rx0:rx1] = blended
+
+            # Outline via erosion differencing: mask minus its eroded
+            # self is a 1-px boundary, purely elementwise — no
+            # polyline tracing, no instance disambiguation needed. The
+            # 2x upscale restores the old thickness-2 look.
+            out_roi = outlined_frame[ry0:ry1, rx0:rx1]
+            for i, mask_uint8 in enumerate(masks):
+                m = mask_uint8[hy0:hy1, hx0:hx1]
+                boundary = cv2.subtract(m, cv2.erode(m, _BOUNDARY_KERNEL))
+                boundary = cv2.resize(
+                    boundary, (rx1 - rx0, ry1 - ry0), interpolation=cv2.INTER_NEAREST
+                )
+                out_roi[boundary > 0] = COLORS[int(labels[i]) % len(COLORS)]
+
+            for i, mask_uint8 in enumerate(masks):
+                color = COLORS[int(labels[i]) % len(COLORS)]
+
+                x1, y1, x2, y2 = int_boxes[i]
+                label = model.names[int(labels[i])]
+                premult, bg_mask, box_width, box_height = label_sprite(label, color)
+
+                box_x = x1 - 10
+                box_y = max(30, y1 - box_height - 20)
+                box_x = min(max(box_x, 0), W - box_width - 1)
+                box_y = min(box_y, H - box_height - 1)
+
+                # Keep only the to-be-tinted background of the ROI, scale
+                # it, and add the premultiplied sprite on top — drawn
+                # pixels were zeroed by the mask, so they land opaque.
+                roi = outlined_frame[box_y:box_y + box_height, box_x:box_x + box_width]
+                tinted = cv2.bitwise_and(roi, roi, mask=bg_mask)
+                cv2.addWeighted(tinted, 0.4, premult, 1.0, 0, dst=tinted)
+                roi[:] = tinted
+
+                try:
+                    crop_q.put_nowait((label, frame, boxes[i]))
+                except queue.Full:
+                    pass
+
+        cv2.imshow("Percepta lens test", outlined_frame)
+        if cv2.waitKey(1) & 0xFF == ord("q"):
+            stop_event.set()
+
+
+_BOX_SCALE = None
+
+
+def unpack_detections(results, frame_shape):
+    """Pull one frame's (pre-filtered) results to the host and rescale."""
+    global _BOX_SCALE
+    det = results.boxes
+    if det is None or len(det) == 0:
+        return (), (), (), ()
+
+    # predict(conf=0.35) already thresholded on device, so everything here
+    # is a keeper; pack boxes and classes into one tensor so a single
+    # .cpu() sync moves them — separate pulls each pay their own implicit
+    # synchronize.
+    packed = torch.cat([det.xyxy, det.cls[:, None]], dim=1).cpu().numpy()
+    boxes = packed[:, :4]
+    labels = packed[:, 4]
+
+    if results.masks is not None:
+        kept_masks = results.masks.data
+        # masks.data lives in letterboxed inference space — the input is
+        # padded up to a stride-32 size — while boxes come back already
+        # rescaled to the source frame. Strip the padding rows/cols first
+        # or the masks land squashed and offset relative to the boxes.
+        mh, mw = kept_masks.shape[-2:]
+        gain = min(mh / DET_H, mw / DET_W)
+        pad_h = (mh - DET_H * gain) / 2
+        pad_w = (mw - DET_W * gain) / 2
+        top, left = int(round(pad_h)), int(round(pad_w))
+        kept_masks = kept_masks[:, top:mh - top, left:mw - left]
+        # Resize and binarize on device too: one transfer of ready uint8
+        # masks replaces a per-mask cv2.resize on the render thread. Half
+        # display resolution is plenty for union/contour work — the
+        # renderer upscales only the final edge map — and quarters the
+        # bytes every mask op touches.
+        kept_masks = torch.nn.functional.interpolate(
+            kept_masks.unsqueeze(1).float(),
+            size=(frame_shape[0] // 2, frame_shape[1] // 2),
+            mode="nearest",
+        ).squeeze(1)
+        masks = ((kept_masks > 0.5) * 255).to(torch.uint8).cpu().numpy()
+    else:
+        masks = ()
+
+    # Camera resolution is fixed, so the detection-to-display scale vector
+    # is built exactly once.
+    if _BOX_SCALE is None:
+        sx = frame_shape[1] / DET_W
+        sy = frame_shape[0] / DET_H
+        _BOX_SCALE = np.array([sx, sy, sx, sy], dtype=boxes.dtype)
+    boxes = boxes * _BOX_SCALE
+    return boxes, labels, masks, boxes.astype(np.int32)
+
+
+# The inference stage pops frames, refreshes detections every Kth one, and
+# hands (frame, detections) to the renderer. When the reader runs ahead, up
+# to BATCH frames drain at once and their due detections share a single
+# model call — batches only form under backlog, so the light-load latency
+# is unchanged. This runs on a worker thread: highgui is not thread-safe
+# and macOS aborts when windows are touched off the main thread, so the
+# main thread keeps imshow/waitKey and the model moves here instead.
+BATCH = 4
+
+
+def run_inference():
+    frame_idx = 0
+    boxes = labels = masks = int_boxes = ()
+
+    while not stop_event.is_set():
+        try:
+            frames = [read_q.get(timeout=0.1)]
+        except queue.Empty:
+            continue
+        while len(frames) < BATCH:
+            try:
+                frames.append(read_q.get_nowait())
+            except queue.Empty:
+                break
+
+        due = [o for o in range(len(frames)) if (frame_idx + o) % DETECT_EVERY == 0]
+        detections = {}
+        if due:
+            smalls = [
+                cv2.resize(frames[o], (DET_W, DET_H), interpolation=cv2.INTER_LINEAR)
+                for o in due
+            ]
+            batch_results = model.predict(
+                smalls, device=DEVICE, half=USE_HALF, imgsz=416, conf=0.35, verbose=False
+            )
+            detections = dict(zip(due, batch_results))
+
+        for offset, frame in enumerate(frames):
+            results = detections.get(offset)
+            if results is not None:
+                boxes, labels, masks, int_boxes = unpack_detections(results, frame.shape)
+            item = (frame, (boxes, labels, masks, int_boxes))
+            while True:
+                try:
+                    draw_q.put_nowait(item)
+                    break
+                except queue.Full:
+                    try:
+                        draw_q.get_nowait()
+                    except queue.Empty:
+                        pass
+        frame_idx += len(frames)
+
+
+reader_thread = threading.Thread(target=capture_frames, daemon=True)
+inference_thread = threading.Thread(target=run_inference, daemon=True)
+reader_thread.start()
+inference_thread.start()
+
+# Render and display on the main thread — the only place highgui is safe.
+render_frames()
+
+stop_event.set()
+reader_thread.join(timeout=1.0)
+inference_thread.join(timeout=1.0)
+cap.release()
+cv2.destroyAllWindows()